@@ -1,18 +1,58 @@
+import logging
 import pdfplumber
 import re
 import os
+import sys
+import hashlib
+import pickle
+import numpy as np
 import pandas as pd
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
+# pypdfium2 (C-backed PDFium) extracts text far faster than pdfplumber's
+# pure-Python pdfminer stack; fall back to pdfplumber when not installed
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+
+# pdfminer (under pdfplumber) can emit a log record per token; if a host
+# framework raises the root logger level that becomes a massive stderr
+# slowdown, so cap both libraries' loggers unconditionally
+logging.getLogger("pdfminer").setLevel(logging.ERROR)
+logging.getLogger("pdfplumber").setLevel(logging.WARNING)
 
-filename = input("Enter invoice filename: ")
 PDF_FILE_PATH = "FY25 P8 5057820314.pdf"
 EXCEL_FILE_PATH = "TDL_DATABASE.xlsx"
 
+# Precompiled patterns - compiling once at module load avoids re-compiling
+# (and re-checking re's internal cache) on every line of every page.
+# Item lines are found with one multiline pass over the whole page text;
+# the invoice-number and charge patterns only ever fire on the first/last
+# page, so they live behind cheap substring gates instead of being probed
+# at every position of every page.
+# Patterns are bytes - each page is encoded once and matched on the flat
+# byte buffer, which _sre scans with a tighter inner loop than str;
+# captured groups are decoded only when actually consumed
+# [^\S\n] (whitespace except newline) keeps a bare 5-8 digit line - an
+# order or store number printed alone - from fusing with the next line
+ITEM_LINE_RE = re.compile(rb'^(\d{5,8})[^\S\n][^\n]*', re.MULTILINE)
+INVOICE_RE = re.compile(rb'Invoice Number\s*:\s*(\d+)')
+TARIFF_RE = re.compile(rb'Tariff Allocation\s+(\d+\.\d+)')
+FUEL_RE = re.compile(rb'Fuel Surcharge\s+\d+\.\d+\s+0\.00\s+(\d+\.\d+)')
+FUEL_ALT_RE = re.compile(rb'Fuel Surcharge\s+(\d+\.\d+)')
+GST_RE = re.compile(rb'GST/HST/VAT\s+(\d+\.\d+)')
+
 # Python 3 compatibility note:
 # This script is written for Python 3 and requires these packages:
+# - numpy: vectorized line-total math (installed with pandas)
 # - pandas: for Excel processing
-# - openpyxl: for Excel file reading (used by pandas)
-# - pdfplumber: for PDF processing
+# - python-calamine: fast Excel file reading engine (used by pandas)
+# - pypdfium2: fast PDF text extraction
+# - pdfplumber: fallback PDF processing when pypdfium2 is unavailable
 #
 # Setup instructions:
 # 1. Navigate to the project directory:
@@ -26,160 +66,288 @@ EXCEL_FILE_PATH = "TDL_DATABASE.xlsx"
 #    - On Windows: tdl_env\Scripts\activate
 #
 # 4. Install required packages:
-#    pip install pandas openpyxl pdfplumber
+#    pip install pandas python-calamine pypdfium2 pdfplumber
 #
-# 5. Run the script:
-#    python3 auto_tdl_v1.0_stable.py
+# 5. Run the script (invoice path and page range are optional):
+#    python3 auto_tdl_v1.1_stable.py [invoice.pdf] [pages, e.g. "1-3,7"]
 
-def process_tdl_invoice(pdf_file_path, excel_file_path):
-    print(f"=== Processing Tim Hortons Invoice ===")
-    print(f"Loading database: {excel_file_path}")
-    
-    try:
-        db = pd.read_excel(excel_file_path, usecols=["Item Code", "GL Code", "GL Description"])
-        db["Item Code"] = db["Item Code"].astype(str)
-        print("✅ Database loaded successfully.")
-    except Exception as e:
-        print("❌ Failed to load database:", e)
-        return
+CACHE_DIR_NAME = ".cache"
 
-    # Placeholder for rest of invoice processing logic
-    print("Processing PDF:", pdf_file_path)
+def load_gl_map(excel_file_path):
     """
-    Process a Tim Hortons invoice PDF and extract required information
+    Load the Item Code -> (GL Code, GL Description) map from the Excel DB,
+    caching it as a pickle keyed by the spreadsheet's content hash so warm
+    runs skip the slow Excel parse entirely. The cache lives in a .cache
+    directory next to the spreadsheet, independent of the process cwd
     """
-    print("=== Processing Tim Hortons Invoice ===")
-    
-    # Check if files exist
+    with open(excel_file_path, "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(excel_file_path)), CACHE_DIR_NAME)
+    cache_path = os.path.join(cache_dir, f"{digest}.pkl")
+
+    if os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            return pickle.load(f)
+
+    db = pd.read_excel(excel_file_path, engine="calamine", usecols=["Item Code", "GL Code", "GL Description"])
+    db["Item Code"] = db["Item Code"].astype(str)
+    # Plain dict lookup is O(1) per item vs a full-column scan per line
+    gl_map = dict(zip(db["Item Code"], zip(db["GL Code"], db["GL Description"])))
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(cache_path, "wb") as f:
+        pickle.dump(gl_map, f)
+    return gl_map
+
+def _page_count(pdf_file_path):
+    if pdfium is not None:
+        pdf = pdfium.PdfDocument(pdf_file_path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+    with pdfplumber.open(pdf_file_path) as pdf:
+        return len(pdf.pages)
+
+def _rebuild_page_text(textpage):
+    """
+    Reassemble visual lines from pdfium's text rects. PDFium returns page
+    text in char-stream order, which splits each printed row across
+    several fragments and breaks the positional qty/price parsing; the
+    parser needs pdfplumber-style visual lines. Cluster the rect segments
+    by top coordinate (chaining successive gaps within 3pt, as pdfplumber
+    does) and join each line's segments left to right
+    """
+    segs = []
+    for i in range(textpage.count_rects()):
+        left, bottom, right, top = textpage.get_rect(i)
+        txt = textpage.get_text_bounded(left=left, bottom=bottom, right=right, top=top)
+        # A single rect can contain an embedded wrap; collapse it so a
+        # rebuilt line never carries an internal newline
+        txt = ' '.join(txt.split()) if txt else ''
+        if txt:
+            segs.append((top, left, txt))
+    segs.sort(key=lambda s: (-s[0], s[1]))
+
+    lines = []
+    last_top = None
+    for top, left, txt in segs:
+        if last_top is None or last_top - top > 3:
+            lines.append([])
+        lines[-1].append((left, txt))
+        last_top = top
+    for parts in lines:
+        parts.sort()
+    return '\n'.join(' '.join(txt for _, txt in parts) for parts in lines)
+
+def _extract_page_text(pdf_file_path, page_num):
+    """
+    Worker: open the PDF and extract a single page's text. Uses pypdfium2
+    when available (this script only needs raw text, none of pdfplumber's
+    layout/table analysis), falling back to pdfplumber otherwise
+    """
+    if pdfium is not None:
+        pdf = pdfium.PdfDocument(pdf_file_path)
+        try:
+            page = pdf[page_num]
+            textpage = page.get_textpage()
+            text = _rebuild_page_text(textpage)
+            textpage.close()
+            page.close()
+            return text
+        finally:
+            pdf.close()
+
+    # extract_text_simple skips pdfplumber's layout-aware word clustering;
+    # only raw text split on newlines is needed here. Blank/image-only
+    # pages yield None, so normalize to "" for the regex pass
+    with pdfplumber.open(pdf_file_path) as pdf:
+        return pdf.pages[page_num].extract_text_simple() or ""
+
+def extract_page_texts(pdf_file_path, pages=None):
+    """
+    Extract page texts from the PDF. Per-page extraction is independent,
+    so fan pages out across a process pool and reassemble in page order;
+    the cheap regex parsing stays in the main process.
+
+    pages is an optional list of 1-based page numbers (same convention as
+    pdfplumber.open's pages argument); by default every page is parsed
+    """
+    n_pages = _page_count(pdf_file_path)
+    if pages is None:
+        indices = range(n_pages)
+    else:
+        indices = [p - 1 for p in pages if 0 < p <= n_pages]
+
+    if len(indices) <= 1:
+        return [_extract_page_text(pdf_file_path, i) for i in indices]
+
+    workers = min(os.cpu_count() or 1, len(indices))
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(partial(_extract_page_text, pdf_file_path), indices))
+
+def process_tdl_invoice(pdf_file_path, excel_file_path, pages=None):
+    print(f"=== Processing Tim Hortons Invoice ===")
+
+    # Check both files exist before paying for the DB load - a typo'd PDF
+    # path shouldn't cost a full Excel parse first
     if not os.path.exists(pdf_file_path):
         print(f"Error: PDF file not found: {pdf_file_path}")
         return
-    
+
     if not os.path.exists(excel_file_path):
         print(f"Error: Excel database file not found: {excel_file_path}")
         return
-    
-    # Load database
+
     print(f"Loading database: {excel_file_path}")
-    db = pd.read_excel(excel_file_path)
-    
-    # Ensure database has required columns
-    required_cols = ["Item Code", "GL Code", "GL Description"]
-    missing_cols = [col for col in required_cols if col not in db.columns]
-    if missing_cols:
-        print(f"Error: Missing required columns in database: {', '.join(missing_cols)}")
+
+    try:
+        gl_map = load_gl_map(excel_file_path)
+        print("✅ Database loaded successfully.")
+    except Exception as e:
+        print("❌ Failed to load database:", e)
         return
-    
-    # Convert Item Code to string for matching
-    db["Item Code"] = db["Item Code"].astype(str)
-    
-    # Extract data from PDF
-    items = []
+
+    # Extract data from PDF. Parsed line items are kept in parallel lists
+    # (structure-of-arrays) instead of a dict per row - far less allocation
+    # overhead and better locality in the print/summary loops
+    print("Processing PDF:", pdf_file_path)
+    item_codes = []
+    qtys = []
+    unit_prices = []
+    gl_codes = []
+    gl_descs = []
     invoice_number = None
     tariff_amount = 0.0
     fuel_surcharge = 0.0
     gst_hst_vat = 0.0
     
     try:
-        with pdfplumber.open(pdf_file_path) as pdf:
-            print(f"PDF opened successfully with {len(pdf.pages)} pages")
-            
-            # Process each page
-            for page_num, page in enumerate(pdf.pages):
-                print(f"Processing page {page_num + 1}/{len(pdf.pages)}")
-                text = page.extract_text()
-                
-                # Extract invoice number (only from first page)
-                if page_num == 0 and not invoice_number:
-                    invoice_match = re.search(r'Invoice Number\s*:\s*(\d+)', text)
-                    if invoice_match:
-                        invoice_number = invoice_match.group(1)
-                        print(f"Invoice Number: {invoice_number}")
-                
-                # Process line items on all pages
-                lines = text.split('\n')
-                for line in lines:
-                    # Look for item codes (8 digits or occasionally 5 digits at start of line)
-                    item_code_match = re.match(r'^(\d{5,8})\s', line)
-                    if item_code_match:
-                        item_code = item_code_match.group(1)
-                        # Pad to 8 digits if shorter
-                        if len(item_code) < 8:
-                            item_code = item_code.zfill(8)
-                        
-                        # Extract quantities and price
-                        parts = line.split()
-                        
-                        # Extract numerical values (find positions of numbers)
-                        numbers = []
-                        for part in parts:
-                            if re.match(r'^\d+\.?\d*$', part) or re.match(r'^\d+$', part):
-                                numbers.append(part)
-                        
-                        # Skip if we don't have enough numbers
-                        if len(numbers) < 4:
-                            continue
-                        
-                        # Tim Hortons invoice format has these numbers in specific positions
-                        try:
-                            qty = int(float(numbers[1]))  # Shipped qty is typically the 2nd number
-                            unit_price = float(numbers[3])  # Unit price is typically the 4th number
-                            line_total = round(qty * unit_price, 2)
-                            
-                            # Look up GL code and description
-                            gl_code = "NOT_FOUND"
-                            gl_desc = "NOT_FOUND"
-                            
-                            match = db[db["Item Code"] == item_code]
-                            if not match.empty:
-                                gl_code = match.iloc[0]["GL Code"]
-                                gl_desc = match.iloc[0]["GL Description"]
-                            
-                            # Add to items list
-                            items.append({
-                                "Item Code": item_code,
-                                "Quantity": qty,
-                                "Unit Price": unit_price,
-                                "Line Total": line_total,
-                                "GL Code": gl_code,
-                                "GL Description": gl_desc
-                            })
-                        except (IndexError, ValueError):
-                            pass
-                
-                # Look for additional charges on last page
-                if page_num == len(pdf.pages) - 1:
-                    # Extract tariff amount
-                    tariff_match = re.search(r'Tariff Allocation\s+(\d+\.\d+)', text)
+        texts = extract_page_texts(pdf_file_path, pages)
+        n_pages = len(texts)
+        print(f"PDF opened successfully with {n_pages} pages")
+
+        # Process each page
+        for page_num, text in enumerate(texts):
+            print(f"Processing page {page_num + 1}/{n_pages}")
+
+            # Blank or image-only pages have no text to scan; previously a
+            # None here would have crashed the whole run
+            if not text or not text.strip():
+                continue
+
+            # Encode once; invoice text is ASCII-heavy and the bytes
+            # patterns run on the flat buffer. 'replace' keeps a '?'
+            # placeholder for codepoints above U+00FF - silently dropping
+            # them could splice two digit runs into one bogus number token
+            btext = text.encode('latin-1', 'replace')
+
+            # Extract invoice number (only from first page); the substring
+            # test short-circuits the regex on pages that can't match
+            if page_num == 0 and not invoice_number and b'Invoice Number' in btext:
+                invoice_match = INVOICE_RE.search(btext)
+                if invoice_match:
+                    invoice_number = invoice_match.group(1).decode('ascii')
+                    print(f"Invoice Number: {invoice_number}")
+
+            # Single multiline pass over the page text for item lines
+            # (item codes are 8 digits, occasionally 5, at start of line)
+            for m in ITEM_LINE_RE.finditer(btext):
+                item_code = m.group(1).decode('ascii')
+                # Pad to 8 digits if shorter
+                if len(item_code) < 8:
+                    item_code = item_code.zfill(8)
+
+                # Extract quantities and price; only matched lines pay the
+                # cost of decoding back to str
+                parts = m.group(0).decode('latin-1').split()
+
+                # Extract numerical values (find positions of numbers);
+                # float() is a C builtin and much cheaper than a regex probe,
+                # but alone it also accepts signed/exponent/inf forms the old
+                # ^\d+\.?\d*$ pattern rejected - description fragments like
+                # "-78" must not count as numbers, so require a digit first
+                numbers = []
+                for part in parts:
+                    if not part[0].isdigit():
+                        continue
+                    try:
+                        float(part)
+                    except ValueError:
+                        continue
+                    numbers.append(part)
+                    # Only numbers[1] and numbers[3] are consumed below
+                    if len(numbers) == 4:
+                        break
+
+                # Skip if we don't have enough numbers
+                if len(numbers) < 4:
+                    continue
+
+                # Tim Hortons invoice format has these numbers in specific positions
+                try:
+                    qty = int(float(numbers[1]))  # Shipped qty is typically the 2nd number
+                    unit_price = float(numbers[3])  # Unit price is typically the 4th number
+
+                    # Look up GL code and description
+                    gl_code, gl_desc = gl_map.get(item_code, ("NOT_FOUND", "NOT_FOUND"))
+
+                    # Add to the parallel item lists
+                    item_codes.append(item_code)
+                    qtys.append(qty)
+                    unit_prices.append(unit_price)
+                    gl_codes.append(gl_code)
+                    gl_descs.append(gl_desc)
+                except (IndexError, ValueError):
+                    pass
+
+            # Look for additional charges on last page, each gated by a
+            # cheap substring test before entering the regex engine
+            if page_num == n_pages - 1:
+                # Extract tariff amount
+                if b'Tariff Allocation' in btext:
+                    tariff_match = TARIFF_RE.search(btext)
                     if tariff_match:
                         tariff_amount = float(tariff_match.group(1))
-                    
-                    # Extract fuel surcharge
-                    fuel_match = re.search(r'Fuel Surcharge\s+\d+\.\d+\s+0\.00\s+(\d+\.\d+)', text)
+
+                # Extract fuel surcharge
+                if b'Fuel Surcharge' in btext:
+                    fuel_match = FUEL_RE.search(btext)
                     if fuel_match:
                         fuel_surcharge = float(fuel_match.group(1))
                     else:
                         # Try alternate format
-                        fuel_match = re.search(r'Fuel Surcharge\s+(\d+\.\d+)', text)
+                        fuel_match = FUEL_ALT_RE.search(btext)
                         if fuel_match:
                             fuel_surcharge = float(fuel_match.group(1))
-                    
-                    # Extract GST/HST/VAT
-                    gst_match = re.search(r'GST/HST/VAT\s+(\d+\.\d+)', text)
+
+                # Extract GST/HST/VAT
+                if b'GST/HST/VAT' in btext:
+                    gst_match = GST_RE.search(btext)
                     if gst_match:
                         gst_hst_vat = float(gst_match.group(1))
     
     except Exception as e:
         print(f"Error processing PDF: {e}")
         return
-    
-    # Print extracted items in table format
-    print("\n" + "=" * 100)
-    print(f"{'ITEM CODE':<12} {'QTY':<6} {'UNIT PRICE':<12} {'LINE TOTAL':<12} {'GL CODE':<10} {'GL DESCRIPTION':<30}")
-    print("=" * 100)
-    
-    for item in items:
-        print(f"{item['Item Code']:<12} {item['Quantity']:<6} ${item['Unit Price']:<10.2f} ${item['Line Total']:<10.2f} {str(item['GL Code']):<10} {item['GL Description']:<30}")
+
+    # One vectorized multiply+round for all line totals instead of doing
+    # the arithmetic per line inside the parsing loop
+    line_totals = np.round(np.multiply(qtys, unit_prices), 2).tolist()
+
+    # Print extracted items in table format - buffer the rows and emit
+    # them with one write instead of a print (and flush) per line
+    buf = [
+        "",
+        "=" * 100,
+        f"{'ITEM CODE':<12} {'QTY':<6} {'UNIT PRICE':<12} {'LINE TOTAL':<12} {'GL CODE':<10} {'GL DESCRIPTION':<30}",
+        "=" * 100,
+    ]
+    for item_code, qty, unit_price, line_total, gl_code, gl_desc in zip(
+            item_codes, qtys, unit_prices, line_totals, gl_codes, gl_descs):
+        buf.append(f"{item_code:<12} {qty:<6} ${unit_price:<10.2f} ${line_total:<10.2f} {str(gl_code):<10} {gl_desc:<30}")
+    sys.stdout.write("\n".join(buf) + "\n")
     
     # Print additional charges
     print("\nAdditional Charges:")
@@ -188,26 +356,51 @@ def process_tdl_invoice(pdf_file_path, excel_file_path):
     print(f"GST/HST/VAT: ${gst_hst_vat:.2f}")
     
     # Calculate summary by GL Description
-    summary = {}
-    for item in items:
-        gl_desc = item['GL Description']
-        summary[gl_desc] = summary.get(gl_desc, 0) + item['Line Total']
+    summary = defaultdict(float)
+    for gl_desc, line_total in zip(gl_descs, line_totals):
+        summary[gl_desc] += line_total
     
-    # Print summary
-    print("\nSummary by GL Description:")
-    print("=" * 50)
+    # Print summary, buffered the same way as the items table
+    buf = ["", "Summary by GL Description:", "=" * 50]
     total_amount = 0
     for gl_desc, amount in sorted(summary.items(), key=lambda x: x[1], reverse=True):
-        print(f"{gl_desc}: ${amount:.2f}")
+        buf.append(f"{gl_desc}: ${amount:.2f}")
         total_amount += amount
-    
-    print("=" * 50)
+    buf.append("=" * 50)
+    sys.stdout.write("\n".join(buf) + "\n")
     print(f"Total Amount: ${total_amount:.2f}")
     print(f"Additional Charges: ${tariff_amount + fuel_surcharge + gst_hst_vat:.2f}")
     print(f"Grand Total: ${total_amount + tariff_amount + fuel_surcharge + gst_hst_vat:.2f}")
 
+def parse_page_range(spec):
+    """
+    Parse a CLI page-range spec like "1-3,7" into the list of 1-based
+    page numbers process_tdl_invoice expects
+    """
+    pages = []
+    for chunk in spec.split(','):
+        chunk = chunk.strip()
+        if not chunk:
+            continue
+        if '-' in chunk:
+            start, end = chunk.split('-', 1)
+            pages.extend(range(int(start), int(end) + 1))
+        else:
+            pages.append(int(chunk))
+    return pages
+
 def main():
-    process_tdl_invoice(PDF_FILE_PATH, EXCEL_FILE_PATH)
+    # Invoice path and optional page range come from the command line,
+    # falling back to the default invoice and all pages
+    pdf_file_path = sys.argv[1] if len(sys.argv) > 1 else PDF_FILE_PATH
+    pages = None
+    if len(sys.argv) > 2:
+        try:
+            pages = parse_page_range(sys.argv[2])
+        except ValueError:
+            print(f"Error: invalid page range: {sys.argv[2]}")
+            return
+    process_tdl_invoice(pdf_file_path, EXCEL_FILE_PATH, pages)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file